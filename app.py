@@ -1,16 +1,21 @@
 import streamlit as st
-from io import BytesIO
 import traceback
 import os
 import json
-from PIL import Image
 
-from file_handler import load_file
-from gemini_api import chat_with_gemeni, generate_presentation_sections
-from tts import speak
-from image_gen import generate_image_with_stability
+from file_handler import load_file, load_cached, get_cached
+from gemini_api import stream_chat_with_gemeni, stream_smart_action, run_smart_actions, stream_presentation_sections, Conversation, gemini_scheduler
+from tts import iter_speech
+from image_gen import generate_image_with_stability, generate_slide_images
+from image_prep import encode_for_slide
 from presentation import create_presentation
-from ocr_handler import ocr_space_file
+from translator import translate_slides
+from retrieval import build_context
+from ocr_handler import ocr_space_file, OCR_MODE
+from cache_store import content_hash
+from jobs import job_manager, FAILED
+from image_store import image_store, image_ref, is_image_ref
+from session_snapshot import SnapshotWriter, Snapshot, SnapshotError, is_snapshot
 
 # --- إعداد الصفحة ---
 st.set_page_config(page_title="Smart AI Chatbot", layout="wide")
@@ -23,14 +28,23 @@ def init_session():
         "file_text": "",
         "select_template": False,
         "slides_to_generate": [],
+        "slide_images": [],
+        "slides_version": 0,
         "template_selected": None,
         "pptx_bytes": None,
         "show_download_button": False,
         "show_image_form": False,
-        "generated_image": None,
         "clear_chat_trigger": False,
         "session_loaded": False,
         "image_prompt_from_bot": None,
+        "conversation": Conversation(),
+        "jobs": [],
+        "job_errors": [],
+        "file_key": None,
+        "failed_file_key": None,
+        "used_ocr": False,
+        "snapshot_writer": SnapshotWriter(),
+        "snapshot": None,
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -38,32 +52,200 @@ def init_session():
 
 init_session()
 
+# --- الـ snapshot المحمّل: النص والصور تُفك عند أول استخدام ---
+def get_file_text():
+    """The document text; the text of a loaded snapshot is decoded on first use."""
+    if st.session_state.file_text is None:
+        try:
+            st.session_state.file_text = st.session_state.snapshot.file_text()
+        except SnapshotError as e:
+            st.error(f"❌ The document text could not be restored from the session file: {e}")
+            st.session_state.file_text = ""
+    return st.session_state.file_text
+
+def restore_from_snapshot(msg):
+    """
+    Turns a text or image ref of the loaded snapshot into a regular chat
+    message; a damaged one becomes a short placeholder text.
+    """
+    snapshot = st.session_state.snapshot
+    if not isinstance(msg, dict):
+        return msg
+    try:
+        if is_image_ref(msg):
+            if msg["image"] in snapshot.manifest["blobs"] and image_store.get(msg["image"]) is None:
+                return image_ref(image_store.put(snapshot.blob(msg["image"])))
+            return msg
+        return snapshot.message(msg)
+    except SnapshotError as e:
+        print(f"⚠️ Could not restore a chat message: {e}")
+        return "⚠️ This message could not be restored from the session file."
+
+# --- مهام الخلفية (OCR، الشرائح، الصور) ---
+def start_job(kind, fn, *args, **meta):
+    job_id = job_manager.submit(kind, fn, *args, meta=meta)
+    st.session_state.jobs.append(job_id)
+    # rerun حتى تظهر لوحة المتابعة (job_status_panel) أعلى الصفحة فورًا
+    st.rerun()
+
+def pending_jobs(kind=None):
+    jobs = [job_manager.get(job_id) for job_id in st.session_state.jobs]
+    return [job for job in jobs if job is not None and (kind is None or job.kind == kind)]
+
+def extract_job(job, data, file_name, is_document, settings):
+    file_path = f"temp_{job.id}_{file_name}"
+
+    def extract():
+        with open(file_path, "wb") as f:
+            f.write(data)
+        try:
+            if not is_document:
+                return ocr_space_file(file_path), True
+
+            def on_page(page_number, page_text, done, total):
+                job.progress.setdefault("pages", {})[page_number] = page_text
+                job.progress.update(done=done, total=total)
+
+            return load_file(file_path, on_page=on_page)
+        finally:
+            os.remove(file_path)
+
+    return load_cached(data, extract, **settings)
+
+def slides_job(job, text, regenerate):
+    slides = job.progress.setdefault("slides", [])
+    for slide in stream_presentation_sections(text=text, max_slides=10, language="english", regenerate=regenerate):
+        slides.append(slide)
+    return list(slides)
+
+def image_job(job, prompt, for_slide):
+    image_data = generate_image_with_stability(prompt)
+    if image_data is None:
+        raise RuntimeError("Image generation failed.")
+    image_bytes = image_data.getvalue()
+    return image_store.put(image_bytes), encode_for_slide(image_bytes) if for_slide else None
+
+def slide_images_job(job, slides):
+    return generate_slide_images(slides)
+
+def apply_job_result(job):
+    if job.kind == "extract":
+        text, used_ocr = job.result
+        st.session_state.file_text = text
+        st.session_state.used_ocr = used_ocr
+        st.session_state.file_key = job.meta["file_key"]
+    elif job.kind == "slides":
+        st.session_state.slides_to_generate = job.result
+        st.session_state.slides_version += 1
+        st.session_state.slide_images = [None] * len(job.result)
+        st.session_state.select_template = True
+    elif job.kind == "image":
+        image_id, slide_image = job.result
+        st.session_state.chat_history.append((job.meta["role"], image_ref(image_id)))
+        # نتيجة لشرائح قديمة (أُعيد توليدها أثناء المهمة) لا تُستخدم
+        slide_index = job.meta.get("slide")
+        if (slide_index is not None and job.meta.get("slides_version") == st.session_state.slides_version
+                and slide_index < len(st.session_state.slide_images)):
+            st.session_state.slide_images[slide_index] = slide_image
+    elif job.kind == "slide_images":
+        if job.meta.get("slides_version") == st.session_state.slides_version:
+            st.session_state.slide_images = job.result
+
+def collect_jobs():
+    """Attaches the results of finished jobs to the session."""
+    for job_id in list(st.session_state.jobs):
+        job = job_manager.get(job_id)
+        if job is not None and not job.is_finished:
+            continue
+        st.session_state.jobs.remove(job_id)
+        if job is None:
+            continue
+        job_manager.forget(job_id)
+        if job.status == FAILED:
+            if job.kind == "extract":
+                st.session_state.failed_file_key = job.meta["file_key"]
+            st.session_state.job_errors.append(f"{job.meta.get('label', job.kind)}: {job.error}")
+        else:
+            apply_job_result(job)
+
+@st.fragment(run_every=2)
+def job_status_panel():
+    jobs = pending_jobs()
+    if any(job.is_finished for job in jobs):
+        st.rerun()
+    for job in jobs:
+        label = job.meta.get("label", job.kind)
+        if job.kind == "extract" and job.progress.get("total"):
+            done, total = job.progress["done"], job.progress["total"]
+            st.progress(done / total, text=f"⏳ {label}: page {done}/{total}")
+            pages = dict(job.progress.get("pages", {}))
+            st.text("".join(f"\n\n--- Page {n} ---\n{pages[n]}" for n in sorted(pages)))
+        elif job.kind == "slides" and job.progress.get("slides"):
+            partial_slides = list(job.progress["slides"])
+            st.info(f"⏳ {label}: {len(partial_slides)} slides so far...")
+            for i, slide in enumerate(partial_slides):
+                with st.expander(f"Slide {i+1}: {slide['title']}"):
+                    for bullet in slide["bullets"]:
+                        st.markdown(f"- {bullet}")
+        else:
+            st.info(f"⏳ {label}...")
+
+collect_jobs()
+
 # --- الشريط الجانبي: إدارة الجلسة ---
 with st.sidebar:
     st.markdown("### 💾 Session Management")
     if st.button("💾 Save Session"):
-        session_data = {
-           "chat_history": [
-                (role, msg.decode("utf-8") if isinstance(msg, bytes) else msg)
-                for role, msg in st.session_state.chat_history
-                if not isinstance(msg, bytes)
-            ],    
-            "file_text": st.session_state.file_text,
-            "slides_to_generate": st.session_state.slides_to_generate,
-            "template_selected": st.session_state.template_selected,
-        }
-        json_bytes = json.dumps(session_data).encode("utf-8")
-        st.download_button("⬇️ Download Session", data=json_bytes, file_name="session.json", mime="application/json")
+        snapshot_bytes = st.session_state.snapshot_writer.build(
+            st.session_state.chat_history,
+            get_file_text(),
+            st.session_state.slides_to_generate,
+            st.session_state.template_selected,
+            load_image=image_store.get,
+        )
+        st.download_button(
+            "⬇️ Download Session",
+            data=snapshot_bytes,
+            file_name="session.gcsnap",
+            mime="application/octet-stream",
+        )
 
-    uploaded_session = st.file_uploader("📤 Load Session", type=["json"], label_visibility="collapsed")
+    with st.expander("📊 Gemini Queue"):
+        queue_metrics = gemini_scheduler.metrics()
+        st.write(f"Waiting: {queue_metrics['waiting']}")
+        st.write(f"Served: {queue_metrics['served']}")
+
+    uploaded_session = st.file_uploader("📤 Load Session", type=["gcsnap", "json"], label_visibility="collapsed")
     if uploaded_session and not st.session_state.session_loaded:
-        loaded = json.load(uploaded_session)
-        st.session_state.chat_history = loaded.get("chat_history", [])
-        st.session_state.file_text = loaded.get("file_text", "")
-        st.session_state.slides_to_generate = loaded.get("slides_to_generate", [])
-        st.session_state.template_selected = loaded.get("template_selected", None)
-        st.session_state.session_loaded = True
-        st.success("✅ Session loaded successfully.")
+        try:
+            session_bytes = uploaded_session.getvalue()
+            if is_snapshot(session_bytes):
+                # النص الكامل والرسائل الطويلة والصور تُفك عند أول استخدام
+                snapshot = Snapshot(session_bytes)
+                st.session_state.snapshot = snapshot
+                st.session_state.chat_history = snapshot.chat_history()
+                st.session_state.file_text = None
+                loaded = snapshot.manifest
+            else:
+                loaded = json.loads(session_bytes)
+                st.session_state.snapshot = None
+                st.session_state.chat_history = loaded.get("chat_history", [])
+                st.session_state.file_text = loaded.get("file_text", "")
+            st.session_state.slides_to_generate = loaded.get("slides_to_generate", [])
+            st.session_state.slides_version += 1
+            st.session_state.slide_images = []
+            st.session_state.template_selected = loaded.get("template_selected", None)
+            st.session_state.session_loaded = True
+            st.success("✅ Session loaded successfully.")
+        except (SnapshotError, ValueError) as e:
+            st.error(f"❌ Could not load session: {e}")
+
+# --- حالة المهام الجارية ---
+for error in st.session_state.job_errors:
+    st.error(f"❌ {error}")
+st.session_state.job_errors = []
+if st.session_state.jobs:
+    job_status_panel()
 
 # --- التابات ---
 tabs = st.tabs(["📁 File & Chat", "🎯 Smart Actions", "🎞️ Presentation"])
@@ -72,34 +254,62 @@ tabs = st.tabs(["📁 File & Chat", "🎯 Smart Actions", "🎞️ Presentation"
 with tabs[0]:
     uploaded_file = st.file_uploader("📂 Upload a .pdf, .txt, or image file", type=["pdf", "txt", "png", "jpg", "jpeg"])
     if uploaded_file:
-        file_path = f"temp_{uploaded_file.name}"
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        try:
-            used_ocr = False
-            if uploaded_file.type in ["application/pdf", "text/plain"]:
-                text, used_ocr = load_file(file_path)
+        is_document = uploaded_file.type in ["application/pdf", "text/plain"]
+        data = uploaded_file.getvalue()
+        settings = {
+            "extractor": "load_file" if is_document else "ocr_space",
+            "ext": os.path.splitext(uploaded_file.name)[1].lower(),
+            "language": "eng",
+            "ocr_mode": OCR_MODE,
+        }
+        file_key = content_hash(data, **settings)
+        if not is_document:
+            st.image(uploaded_file, caption="📷 Uploaded Image Preview", use_container_width=True)
+
+        extracting = any(job.meta.get("file_key") == file_key for job in pending_jobs("extract"))
+        is_new_file = file_key not in (st.session_state.file_key, st.session_state.failed_file_key)
+        if is_new_file and not extracting:
+            cached = get_cached(data, **settings)
+            if cached is not None:
+                st.session_state.file_text, st.session_state.used_ocr = cached
+                st.session_state.file_key = file_key
             else:
-                st.image(uploaded_file, caption="📷 Uploaded Image Preview", use_container_width=True)
-                text = ocr_space_file(file_path)
-                used_ocr = True
-            st.session_state.file_text = text
+                start_job(
+                    "extract", extract_job, data, uploaded_file.name, is_document, settings,
+                    file_key=file_key, label=f"Reading {uploaded_file.name}",
+                )
+
+        if st.session_state.failed_file_key == file_key and not extracting:
+            st.warning("⚠️ This file could not be read.")
+            if st.button("🔁 Retry"):
+                st.session_state.failed_file_key = None
+                st.rerun()
+
+        if st.session_state.file_key == file_key:
+            text = get_file_text()
             with st.expander("📄 Preview File Content"):
                 st.text_area("File Content", value=text, height=200)
-            if used_ocr:
+            if st.session_state.used_ocr:
                 st.info("🧠 OCR was used.")
                 if len(text.strip()) < 30:
                     st.warning("⚠️ Very little text was extracted.")
-        except Exception as e:
-            st.error(f"❌ Failed to read file: {e}\n{traceback.format_exc()}")
 
     st.subheader("💬 Ask a Question")
     user_input = st.text_input("Type your question:")
     if st.button("🔍 Ask") and user_input:
         with st.spinner("🤖 Thinking..."):
             try:
-                prompt = st.session_state.file_text + "\n\n" + user_input if st.session_state.file_text else user_input
-                reply, _ = chat_with_gemeni(prompt)
+                file_text = get_file_text()
+                if file_text:
+                    context = build_context(file_text, user_input)
+                    prompt = context + "\n\n" + user_input
+                else:
+                    prompt = user_input
+                reply = st.write_stream(stream_chat_with_gemeni(
+                    prompt,
+                    history=st.session_state.conversation,
+                    history_text=user_input,
+                ))
                 st.session_state.chat_history.extend([
                     ("👤 You", user_input),
                     ("🤖 Bot", reply),
@@ -110,97 +320,125 @@ with tabs[0]:
 
 # --- تاب 2: الإجراءات الذكية ---
 with tabs[1]:
+    regenerate = st.checkbox("🔄 Regenerate (ignore cached replies)", key="regenerate_actions")
     col1, col2 = st.columns(2)
     with col1:
         if st.button("📄 Summarize Document"):
             with st.spinner("Summarizing..."):
-                reply, _ = chat_with_gemeni("Summarize this nicely:\n" + st.session_state.file_text)
+                reply = st.write_stream(stream_smart_action("summary", get_file_text(), regenerate))
                 st.session_state.chat_history.append(("🤖 Summary", reply))
                 st.session_state.image_prompt_from_bot = reply
 
         if st.button("📝 Generate Quiz"):
             with st.spinner("Generating quiz..."):
-                reply, _ = chat_with_gemeni("Create 5 MCQs with answers:\n" + st.session_state.file_text)
+                reply = st.write_stream(stream_smart_action("quiz", get_file_text(), regenerate))
                 st.session_state.chat_history.append(("🤖 Quiz", reply))
 
     with col2:
         if st.button("💡 Create Flashcards"):
             with st.spinner("Creating flashcards..."):
-                reply, _ = chat_with_gemeni("Create flashcards:\n" + st.session_state.file_text)
+                reply = st.write_stream(stream_smart_action("flashcards", get_file_text(), regenerate))
                 st.session_state.chat_history.append(("🤖 Flashcards", reply))
 
         if st.button("📚 Extract Notes"):
             with st.spinner("Extracting notes..."):
-                reply, _ = chat_with_gemeni("Extract key points:\n" + st.session_state.file_text)
+                reply = st.write_stream(stream_smart_action("notes", get_file_text(), regenerate))
                 st.session_state.chat_history.append(("🤖 Notes", reply))
                 st.session_state.image_prompt_from_bot = reply
 
     if st.button("🔍 Explain Concepts"):
         with st.spinner("Explaining..."):
-            reply, _ = chat_with_gemeni("Explain concepts:\n" + st.session_state.file_text)
+            reply = st.write_stream(stream_smart_action("explain", get_file_text(), regenerate))
             st.session_state.chat_history.append(("🤖 Explanation", reply))
             st.session_state.image_prompt_from_bot = reply
 
+    # تشغيل عدة إجراءات في نفس الوقت
+    action_labels = {
+        "summary": "🤖 Summary",
+        "quiz": "🤖 Quiz",
+        "flashcards": "🤖 Flashcards",
+        "notes": "🤖 Notes",
+        "explain": "🤖 Explanation",
+    }
+    selected_actions = st.multiselect(
+        "⚡ Run several actions at once:",
+        list(action_labels.keys()),
+        default=["summary", "quiz", "flashcards", "notes"],
+        format_func=lambda action: action_labels[action].split(" ", 1)[1],
+    )
+    if st.button("⚡ Run Selected Actions") and selected_actions:
+        with st.spinner(f"Running {len(selected_actions)} actions..."):
+            for action, reply in run_smart_actions(
+                selected_actions, get_file_text(), regenerate=regenerate
+            ):
+                st.markdown(f"**{action_labels[action]}:**")
+                st.markdown(reply)
+                st.session_state.chat_history.append((action_labels[action], reply))
+                if action in ("summary", "notes", "explain"):
+                    st.session_state.image_prompt_from_bot = reply
+
+    if st.button("🔊 Read Last Bot Reply Aloud"):
+        text_to_read = st.session_state.image_prompt_from_bot
+        if text_to_read:
+            # كل جزء في عنصر صوت خاص به حتى لا ينقطع التشغيل عند وصول الباقي
+            parts_view = st.expander("🔉 Parts (playable as they arrive)", expanded=True)
+            audio_chunks = []
+            try:
+                for chunk in iter_speech(text_to_read):
+                    audio_chunks.append(chunk)
+                    parts_view.audio(chunk, format="audio/mpeg")
+                st.caption("🔊 Full reply")
+                st.audio(b"".join(audio_chunks), format="audio/mpeg")
+            except Exception as e:
+                st.error(f"❌ Text to speech failed: {e}")
+        else:
+            st.warning("⚠️ No recent bot reply to read.")
+
     if st.button("🎨 Generate Image from Last Bot Reply"):
         prompt = st.session_state.image_prompt_from_bot
         if prompt:
-            with st.spinner("Generating image..."):
-                try:
-                    image_data = generate_image_with_stability(prompt)
-                    if image_data:
-                        image_data.seek(0)
-                        image_bytes = image_data.getvalue()
-                        st.image(image_data, caption="🖼️ Generated Image", use_container_width=True)
-                        st.session_state.generated_image = image_data
-                        st.session_state.chat_history.append(("🖼️ Image from Bot", image_bytes))
-                except Exception as e:
-                    st.error(f"❌ Failed to generate image: {str(e)}")
+            start_job(
+                "image", image_job, prompt, False,
+                role="🖼️ Image from Bot", label="Generating image",
+            )
         else:
             st.warning("⚠️ No recent bot reply to use as prompt.")
 
 # --- تاب 3: توليد العرض التقديمي ---
 with tabs[2]:
-    if st.button("🎞️ Generate Presentation"):
-        with st.spinner("🛠️ Analyzing content and generating slides..."):
-            try:
-                slides = generate_presentation_sections(
-                    text=st.session_state.file_text,
-                    max_slides=10,
-                    language="english"
-                )
-                st.session_state.slides_to_generate = slides
-                st.session_state.select_template = True
-                st.success("✅ Slide structure generated.")
-            except Exception as e:
-                st.error(f"❌ {e}\n{traceback.format_exc()}")
+    regenerate_slides = st.checkbox("🔄 Regenerate (ignore cached slides)", key="regenerate_slides")
+    if st.button("🎞️ Generate Presentation") and not pending_jobs("slides"):
+        start_job(
+            "slides", slides_job, get_file_text(), regenerate_slides,
+            label="Generating slides",
+        )
 
-    for i, slide in enumerate(st.session_state.slides_to_generate):
+    slides = st.session_state.slides_to_generate
+    if len(st.session_state.slide_images) != len(slides):
+        st.session_state.slide_images = [None] * len(slides)
+
+    if slides and st.button("🖼️ Generate All Slide Images"):
+        start_job(
+            "slide_images", slide_images_job, list(slides),
+            slides_version=st.session_state.slides_version, label=f"Creating {len(slides)} slide images",
+        )
+    missing_images = sum(1 for image in st.session_state.slide_images if not image)
+    if slides and 0 < missing_images < len(slides):
+        st.caption(f"ℹ️ {missing_images} slides have no image yet.")
+
+    for i, slide in enumerate(slides):
         with st.expander(f"Slide {i+1}: {slide['title']}"):
             for bullet in slide['bullets']:
                 st.markdown(f"- {bullet}")
+            if st.session_state.slide_images[i]:
+                st.image(st.session_state.slide_images[i], width=300)
             if st.button(f"🖼️ Generate Image from Slide {i+1}",key=f"generate_img_slide_{i}"):
                 full_slide_text = slide["title"] + "\n" + "\n".join(slide["bullets"])
-                with st.spinner("Creating image..."):
-                    try:
-                        image_data = generate_image_with_stability(full_slide_text)
-                        if image_data:
-                            image_data.seek(0)
-                            image_bytes = image_data.getvalue()
-                            st.image(image_data, caption=f"🖼️ Image for Slide {i+1}", use_container_width=True)
-                            buffer = BytesIO(image_bytes)
-                            buffer.seek(0)
-                            st.download_button(
-                                label=f"📥 Download Slide {i+1} Image",
-                                data=buffer,
-                                file_name=f"slide_{i+1}_image.png",
-                                mime="image/png",
-                                key=f"download_slide_{i}"
-
-
-                                             )
-                            st.session_state.chat_history.append((f"🖼️ Slide {i+1} Image", image_bytes))
-                    except Exception as e:
-                        st.error(f"❌ Image generation failed: {str(e)}")
+                start_job(
+                    "image", image_job, full_slide_text, True,
+                    role=f"🖼️ Slide {i+1} Image", slide=i, slides_version=st.session_state.slides_version,
+                    label=f"Creating image for slide {i+1}",
+                )
 
     if st.session_state.select_template:
         st.markdown("## 🎨 Select a Presentation Template")
@@ -237,10 +475,19 @@ with tabs[2]:
             st.success(f"✅ Template selected: {selected_template}")
 
     if st.session_state.show_download_button and st.session_state.template_selected:
+        deck_language = st.radio("🌐 Presentation language:", ["english", "arabic"], horizontal=True, key="deck_language")
         with st.spinner("💾 Generating Presentation..."):
+            deck_slides = st.session_state.slides_to_generate
+            if deck_language == "arabic":
+                try:
+                    deck_slides = translate_slides(deck_slides, dest="ar")
+                except Exception as e:
+                    st.error(f"❌ Translation failed, using the original slides: {e}")
             pptx_bytes = create_presentation(
-                st.session_state.slides_to_generate,
-                template_path=st.session_state.template_selected
+                deck_slides,
+                language=deck_language,
+                template_path=st.session_state.template_selected,
+                images=st.session_state.slide_images,
             )
             st.download_button(
                 label="📥 Download PowerPoint",
@@ -256,23 +503,31 @@ if st.session_state.clear_chat_trigger:
     st.session_state.chat_history = []
     st.session_state.clear_chat_trigger = False
 
-for role, msg in st.session_state.chat_history:
+for idx, (role, msg) in enumerate(st.session_state.chat_history):
     st.markdown(f"**{role}:**")
-    if isinstance(msg, bytes):
-        st.image(msg, use_container_width=True)
-        img = Image.open(BytesIO(msg))
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
+    if st.session_state.snapshot is not None:
+        msg = restore_from_snapshot(msg)
+        st.session_state.chat_history[idx] = (role, msg)
+    if is_image_ref(msg):
+        thumbnail = image_store.thumbnail(msg["image"])
+        image_bytes = image_store.get(msg["image"])
+        if thumbnail is None or image_bytes is None:
+            st.caption("🖼️ Image is no longer available.")
+            continue
+        st.image(thumbnail)
         st.download_button(
             label="📥 Download Image",
-            data=buffer,
+            data=image_bytes,
             file_name="chat_image.png",
             mime="image/png",
-            key=f"download_chat_img_{id(buffer)}"
+            key=f"download_chat_img_{idx}_{msg['image'][:12]}"
                   )
     else:
         st.markdown(msg)
+# بعد عرض المحادثة لا نحتاج الـ snapshot إلا لنص الملف إن لم يُفك بعد
+if st.session_state.snapshot is not None and st.session_state.file_text is not None:
+    st.session_state.snapshot = None
+
 if st.button("🗑️ Clear Chat History"):
     for key in list(st.session_state.keys()):
         del st.session_state[key]
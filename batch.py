@@ -0,0 +1,207 @@
+# batch.py
+"""
+Headless batch conversion: document -> slides -> .pptx for a whole folder.
+
+    python batch.py course_pdfs/ --output-dir decks/ --template templates/Professional.pptx
+
+Extraction and rendering run in a process pool, model calls in a small
+thread pool throttled by gemini_api's scheduler. A JSON report with
+per-stage timings is rewritten after every file, and files already marked
+done in it are skipped on the next run.
+
+Worker processes are spawned (not forked) so none of them inherits the
+parent's SQLite connection to the OCR cache, and the OCR.space request rate
+(OCR_REQUESTS_PER_SECOND) is split evenly between them.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import ocr_handler
+from cache_store import content_hash
+from file_handler import load_file
+from rate_limit import TokenBucket
+from gemini_api import generate_presentation_sections
+from presentation import create_presentation
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+
+def find_documents(input_dir):
+    for root, _, names in os.walk(input_dir):
+        for name in sorted(names):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return content_hash(f.read())
+
+
+def init_worker(workers):
+    """Gives each process its share of the OCR.space rate limit."""
+    limiter = ocr_handler.ocr_rate_limiter
+    ocr_handler.ocr_rate_limiter = TokenBucket(
+        rate=limiter.rate / workers,
+        capacity=max(1.0, limiter.capacity / workers),
+    )
+
+
+def extract_worker(path):
+    start = time.perf_counter()
+    text, used_ocr = load_file(path)
+    return text, used_ocr, time.perf_counter() - start
+
+
+def slides_worker(text, language, max_slides):
+    start = time.perf_counter()
+    slides = generate_presentation_sections(text, language=language, max_slides=max_slides)
+    if len(slides) == 1 and slides[0]["title"] == "Error":
+        raise RuntimeError("; ".join(slides[0]["bullets"]))
+    return slides, time.perf_counter() - start
+
+
+def render_worker(slides, template_path, language, output_path):
+    start = time.perf_counter()
+    pptx_bytes = create_presentation(slides, language=language, template_path=template_path)
+    with open(output_path, "wb") as f:
+        f.write(pptx_bytes)
+    return time.perf_counter() - start
+
+
+class RunReport:
+    """Per-file status and timings, saved atomically after every change."""
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {"files": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def is_done(self, rel_path, digest, output_path):
+        entry = self.data["files"].get(rel_path)
+        return (
+            entry is not None
+            and entry.get("status") == "done"
+            and entry.get("sha256") == digest
+            and os.path.exists(output_path)
+        )
+
+    def update(self, rel_path, **fields):
+        entry = self.data["files"].setdefault(rel_path, {"timings": {}})
+        timings = fields.pop("timings", None)
+        if timings:
+            entry["timings"].update(timings)
+        entry.update(fields)
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def run_batch(input_dir, output_dir, template_path, language="english", max_slides=10,
+              workers=None, model_workers=2, report_path=None):
+    os.makedirs(output_dir, exist_ok=True)
+    report = RunReport(report_path or os.path.join(output_dir, "batch_report.json"))
+
+    jobs = {}
+    for path in find_documents(input_dir):
+        rel_path = os.path.relpath(path, input_dir)
+        output_path = os.path.join(output_dir, os.path.splitext(rel_path)[0] + ".pptx")
+        digest = file_hash(path)
+        if report.is_done(rel_path, digest, output_path):
+            print(f"⏭️ {rel_path} already done")
+            continue
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        jobs[rel_path] = {"path": path, "output": output_path, "sha256": digest, "started": time.perf_counter()}
+
+    if not jobs:
+        print("✅ Nothing to do.")
+        return report.data
+
+    workers = workers or os.cpu_count() or 1
+    cpu_pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_worker,
+        initargs=(workers,),
+    )
+    with cpu_pool, ThreadPoolExecutor(max_workers=model_workers) as model_pool:
+        pending = {}
+        for rel_path, job in jobs.items():
+            report.update(rel_path, status="running", sha256=job["sha256"], output=job["output"], error=None)
+            pending[cpu_pool.submit(extract_worker, job["path"])] = ("extract", rel_path)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, rel_path = pending.pop(future)
+                job = jobs[rel_path]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"❌ {rel_path} failed at {stage}: {e}")
+                    report.update(rel_path, status="failed", error=f"{stage}: {e}")
+                    continue
+
+                if stage == "extract":
+                    text, used_ocr, seconds = result
+                    report.update(rel_path, used_ocr=used_ocr, timings={"extract": round(seconds, 3)})
+                    next_future = model_pool.submit(slides_worker, text, language, max_slides)
+                    pending[next_future] = ("slides", rel_path)
+                elif stage == "slides":
+                    slides, seconds = result
+                    report.update(rel_path, slides=len(slides), timings={"slides": round(seconds, 3)})
+                    next_future = cpu_pool.submit(render_worker, slides, template_path, language, job["output"])
+                    pending[next_future] = ("render", rel_path)
+                else:
+                    total = time.perf_counter() - job["started"]
+                    report.update(
+                        rel_path,
+                        status="done",
+                        timings={"render": round(result, 3), "total": round(total, 3)},
+                    )
+                    print(f"✅ {rel_path} -> {job['output']}")
+
+    return report.data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a folder of PDFs / text files into .pptx decks.")
+    parser.add_argument("input_dir")
+    parser.add_argument("--output-dir", default="decks")
+    parser.add_argument("--template", default=os.path.join("templates", "Professional.pptx"))
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--max-slides", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=None, help="processes for extraction and rendering")
+    parser.add_argument("--model-workers", type=int, default=2, help="concurrent Gemini calls")
+    parser.add_argument("--report", default=None, help="report path (default: <output-dir>/batch_report.json)")
+    args = parser.parse_args(argv)
+
+    data = run_batch(
+        args.input_dir,
+        args.output_dir,
+        args.template,
+        language=args.language,
+        max_slides=args.max_slides,
+        workers=args.workers,
+        model_workers=args.model_workers,
+        report_path=args.report,
+    )
+    failed = [name for name, entry in data["files"].items() if entry.get("status") != "done"]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# cache_store.py
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def content_hash(data, **settings):
+    """SHA-256 of the given bytes plus any settings that change the result."""
+    h = hashlib.sha256(data)
+    if settings:
+        h.update(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Thread-safe in-memory cache that keeps the most recently used entries."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class DiskCache:
+    """
+    One file per key in a directory, written atomically. Entries older than
+    `ttl` seconds are ignored, and the oldest files are removed once the
+    directory holds more than `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, suffix=".bin", ttl=None, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.suffix = suffix
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            if self.ttl is None and self.max_bytes is not None:
+                os.utime(path)  # least recently used files are evicted first
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"⚠️ Cache write failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        if self.max_bytes is not None:
+            with self._lock:
+                if self._size is None:
+                    self._size = sum(size for _, _, size in self._entries())
+                else:
+                    self._size += len(data)
+                if self._size > self.max_bytes:
+                    self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, name, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller
+    runs fn, the others wait for and share its result (or exception).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class TieredCache:
+    """
+    In-memory LRU in front of an optional on-disk store.
+    Values must be JSON serializable to be persisted.
+    """
+
+    def __init__(self, max_entries=128, cache_dir=None, ttl=None, max_bytes=None):
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries)
+        self.disk = DiskCache(cache_dir, suffix=".json", ttl=ttl, max_bytes=max_bytes) if cache_dir else None
+
+    def get(self, key):
+        entry = self.memory.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            if self.ttl is None or time.time() - stored_at <= self.ttl:
+                return value
+        if self.disk is None:
+            return None
+
+        raw = self.disk.get(key)
+        if raw is None:
+            return None
+        try:
+            value = json.loads(raw.decode("utf-8"))
+        except ValueError:
+            return None
+        self.memory.put(key, (time.time(), value))
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, (time.time(), value))
+        if self.disk is not None:
+            self.disk.put(key, json.dumps(value).encode("utf-8"))
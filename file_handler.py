@@ -1,13 +1,27 @@
 # file_handler.py
 import os
-from ocr_handler import ocr_space_file
-from pdf2image import convert_from_path
-import tempfile
+from ocr_handler import ocr_bytes, OCRError
 import fitz
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from cache_store import TieredCache, content_hash
 
-def load_file(file_path):
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", "4"))
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+# أقل عدد حروف في طبقة النص حتى نعتبر الصفحة غير ممسوحة
+MIN_PAGE_TEXT_CHARS = int(os.getenv("MIN_PAGE_TEXT_CHARS", "25"))
+# علامة الصفحات التي فشل فيها الـ OCR، النص الذي يحتويها لا يُحفظ في الكاش
+OCR_FAILED_MARKER = "[OCR failed: "
+
+# كاش للنصوص المستخرجة حتى لا نعيد الـ OCR مع كل rerun
+extraction_cache = TieredCache(
+    max_entries=int(os.getenv("EXTRACTION_CACHE_SIZE", "32")),
+    cache_dir=os.getenv("EXTRACTION_CACHE_DIR") or None,
+)
+
+def load_file(file_path, on_page=None, max_workers=None):
     """
     Loads content from a .txt or .pdf file and returns (text, used_ocr).
+    on_page / max_workers are passed to the OCR step of scanned PDFs.
     """
     ext = os.path.splitext(file_path)[1].lower()
 
@@ -15,35 +29,132 @@ def load_file(file_path):
         return load_txt(file_path), False
 
     elif ext == ".pdf":
-        return load_pdf(file_path)
+        return load_pdf(file_path, on_page=on_page, max_workers=max_workers)
 
     else:
         raise ValueError("Unsupported file format: Only .txt and .pdf are supported.")
 
+def get_cached(data, **settings):
+    """Cached (text, used_ocr) for uploaded bytes and extractor settings, or None."""
+    cached = extraction_cache.get(content_hash(data, **settings))
+    if cached is None:
+        return None
+    return cached["text"], cached["used_ocr"]
+
+def load_cached(data, extract, **settings):
+    """
+    Returns (text, used_ocr) for uploaded bytes, calling extract() only on a cache miss.
+    The key is the SHA-256 of the bytes plus the extractor settings.
+    """
+    cached = get_cached(data, **settings)
+    if cached is not None:
+        return cached
+
+    text, used_ocr = extract()
+    if OCR_FAILED_MARKER not in text:
+        extraction_cache.put(content_hash(data, **settings), {"text": text, "used_ocr": used_ocr})
+    return text, used_ocr
+
 def load_txt(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read()
 
-def load_pdf(file_path):
+def iter_page_images(file_path, dpi=None, page_numbers=None):
+    """
+    Renders PDF pages one at a time and yields (page_number, png_bytes).
+    Only the page being rendered is held in memory.
+    """
+    doc = fitz.open(file_path)
+    try:
+        numbers = page_numbers or range(1, doc.page_count + 1)
+        for page_number in numbers:
+            pix = doc[page_number - 1].get_pixmap(dpi=dpi or OCR_DPI)
+            data = pix.tobytes("png")
+            del pix
+            yield page_number, data
+    finally:
+        doc.close()
+
+def ocr_pages(page_images, total, on_page=None, max_workers=None):
+    """
+    OCRs (page_number, image_bytes) pairs concurrently and returns {page_number: text}.
+    At most 2 * max_workers rendered pages are in flight, so memory stays flat.
+    on_page(page_number, page_text, done, total) is called from the calling
+    thread as each page finishes, so it is safe to update the UI from it.
+    A page that no engine could read gets an OCR_FAILED_MARKER text instead
+    of failing the whole document.
+    """
+    max_workers = max_workers or OCR_MAX_WORKERS
+    texts = {}
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            page_number = pending.pop(future)
+            try:
+                texts[page_number] = future.result()
+            except OCRError as e:
+                print(f"⚠️ OCR failed for page {page_number}: {e}")
+                texts[page_number] = f"{OCR_FAILED_MARKER}{e}]"
+            if on_page:
+                on_page(page_number, texts[page_number], len(texts), total)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for page_number, data in page_images:
+            if len(pending) >= max_workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[pool.submit(ocr_bytes, data, f"page_{page_number}.png")] = page_number
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    return texts
+
+def has_inline_images(page):
+    """Inline images are not listed by get_images(); they show up as type 1 blocks."""
+    return any(block["type"] == 1 for block in page.get_text("dict")["blocks"])
+
+def page_needs_ocr(page, page_text):
+    """
+    A page goes to OCR when its text layer is too thin and it carries an
+    image (listed or inline), or when it has no text but is drawn with
+    vector outlines. Blank pages stay on the native-text path.
+    """
+    page_text = page_text.strip()
+    if len(page_text) >= MIN_PAGE_TEXT_CHARS:
+        return False
+    if page.get_images(full=False) or has_inline_images(page):
+        return True
+    # صفحة بدون نص لكن عليها أشكال مرسومة (نص محوّل إلى outlines)
+    return not page_text and bool(page.get_drawings())
+
+def load_pdf(file_path, on_page=None, max_workers=None):
     try:
         doc = fitz.open(file_path)
-        text = ""
+        native_texts = []
+        scanned_pages = []
         for page in doc:
-            text += page.get_text()
+            page_text = page.get_text()
+            native_texts.append(page_text)
+            if page_needs_ocr(page, page_text):
+                scanned_pages.append(page.number + 1)
         doc.close()
 
-        if text.strip():
-            return text, False  # PDF عادي
+        if not scanned_pages:
+            return "".join(native_texts), False  # PDF عادي
 
-        # OCR: PDF ممسوح ضوئيًا
+        # OCR فقط للصفحات الممسوحة ضوئيًا
+        page_texts = ocr_pages(
+            iter_page_images(file_path, page_numbers=scanned_pages),
+            total=len(scanned_pages),
+            on_page=on_page,
+            max_workers=max_workers,
+        )
         ocr_text = ""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            images = convert_from_path(file_path)
-            for i, image in enumerate(images):
-                image_path = os.path.join(temp_dir, f"page_{i+1}.png")
-                image.save(image_path, "PNG")
-                page_text = ocr_space_file(image_path)
-                ocr_text += f"\n\n--- Page {i+1} ---\n{page_text}"
+        for page_number, native_text in enumerate(native_texts, 1):
+            page_text = page_texts.get(page_number, native_text)
+            if page_text.strip():
+                ocr_text += f"\n\n--- Page {page_number} ---\n{page_text}"
 
         return ocr_text or "[No text found in scanned PDF]", True
 
@@ -0,0 +1,132 @@
+# http_client.py
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (5, 30)  # (connect, read) seconds
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without touching the network while a service's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets one trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                # half-open: نسمح بمحاولة واحدة
+                self._opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+_sessions = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get_session(url):
+    """Keep-alive session shared by every call to the same host."""
+    host = urlparse(url).netloc
+    with _registry_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def get_breaker(service):
+    with _registry_lock:
+        breaker = _breakers.get(service)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("CIRCUIT_RESET_TIMEOUT", "60")),
+            )
+            _breakers[service] = breaker
+        return breaker
+
+
+def backoff_delay(attempt, base=1.0, cap=20.0):
+    """Exponential backoff with full jitter for the given 1-based attempt."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def request(service, method, url, max_retries=3, backoff=1.0, rate_limiter=None, retry_if=None, **kwargs):
+    """
+    Sends an HTTP request through the pooled session for the url's host.
+    Connection errors and 429/5xx responses are retried with jittered
+    exponential backoff, as are responses for which retry_if(response) is
+    true (services that report transient errors in a 200 body). Repeated
+    failures open the service's circuit so later calls fail fast with
+    CircuitOpenError.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    breaker = get_breaker(service)
+    session = get_session(url)
+
+    for attempt in range(1, max_retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{service} is unavailable, try again later")
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            breaker.record_failure()
+            print(f"⚠️ {service} attempt {attempt} failed: {e}")
+            if attempt == max_retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES and not (retry_if and retry_if(response)):
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            print(f"⚠️ {service} attempt {attempt} returned {response.status_code}")
+            if attempt == max_retries:
+                return response
+
+        delay = backoff_delay(attempt, backoff)
+        print(f"⏳ Retrying {service} in {delay:.1f} seconds...")
+        time.sleep(delay)
+
+
+def post(service, url, **kwargs):
+    return request(service, "POST", url, **kwargs)
@@ -1,31 +1,102 @@
 from io import BytesIO
-import requests
+import http_client
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv     
+from image_prep import encode_for_slide
+from cache_store import DiskCache, SingleFlight, content_hash
 # Load environment variables from .env file
 load_dotenv(dotenv_path=".env")
-def generate_image_with_stability(prompt):
 
+STABILITY_URL = "https://api.stability.ai/v2beta/stable-image/generate/core"
 
+# كاش للصور على القرص + طلب واحد فقط لنفس الـ prompt في نفس الوقت
+image_cache = DiskCache(
+    os.getenv("IMAGE_CACHE_DIR", os.path.join(".cache", "images")),
+    suffix=".img",
+    max_bytes=int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(500 * 1024 * 1024))),
+)
+_in_flight = SingleFlight()
+
+def generate_image_with_stability(prompt, aspect_ratio="1:1", style_preset="digital-art", output_format="png"):
+    """
+    Returns a BytesIO with the generated image, or None on failure. Results
+    are cached on disk by prompt + parameters, and identical concurrent
+    requests share one upstream call.
+    """
+    key = content_hash(
+        prompt.encode("utf-8"),
+        url=STABILITY_URL,
+        aspect_ratio=aspect_ratio,
+        style_preset=style_preset,
+        output_format=output_format,
+    )
+    cached = image_cache.get(key)
+    if cached is not None:
+        return BytesIO(cached)
+
+    def fetch():
+        # قد يكون طلب سابق أنهى التخزين بين الفحص الأول ودخول الـ single-flight
+        data = image_cache.get(key)
+        if data is not None:
+            return data
+        data = _request_image(prompt, aspect_ratio, style_preset, output_format)
+        if data is not None:
+            image_cache.put(key, data)
+        return data
+
+    data = _in_flight.do(key, fetch)
+    return BytesIO(data) if data is not None else None
+
+def _request_image(prompt, aspect_ratio, style_preset, output_format):
     try:
-        url = "https://api.stability.ai/v2beta/stable-image/generate/core"
         headers = {
             "Authorization": f"Bearer {os.getenv('STABILITY_API_KEY')}",
             "Accept": "image/*"
         }
         files = {
             "prompt": (None, prompt),
-            "output_format": (None, "png"),
-            "aspect_ratio": (None, "1:1"),
-            "style_preset": (None, "digital-art")
+            "output_format": (None, output_format),
+            "aspect_ratio": (None, aspect_ratio),
+            "style_preset": (None, style_preset)
         }
 
-        response = requests.post(url, headers=headers, files=files)
+        response = http_client.post(
+            "stability",
+            STABILITY_URL,
+            headers=headers,
+            files=files,
+            timeout=(5, 90),
+            max_retries=2,
+        )
         if response.status_code == 200:
-            return BytesIO(response.content)  # ← wrap in BytesIO
+            return response.content
         else:
             print("❌ API error:", response.status_code, response.text)
             return None
     except Exception as e:
         print("❌ Exception:", e)
         return None
+
+SLIDE_IMAGE_WORKERS = int(os.getenv("SLIDE_IMAGE_WORKERS", "4"))
+
+def slide_image_prompt(slide):
+    return slide["title"] + "\n" + "\n".join(slide["bullets"])
+
+def generate_slide_image(slide):
+    """Generates one slide's image, sized for embedding. Returns bytes or None."""
+    image_data = generate_image_with_stability(slide_image_prompt(slide))
+    if image_data is None:
+        return None
+    try:
+        return encode_for_slide(image_data.getvalue())
+    except Exception as e:
+        print("❌ Could not encode slide image:", e)
+        return None
+
+def generate_slide_images(slides, max_workers=None):
+    """Generates images for all slides concurrently; returns a list aligned with slides."""
+    if not slides:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or SLIDE_IMAGE_WORKERS) as pool:
+        return list(pool.map(generate_slide_image, slides))
@@ -0,0 +1,108 @@
+# image_prep.py
+import io
+import os
+import threading
+
+from PIL import Image, ImageOps
+
+OCR_MAX_LONG_EDGE = int(os.getenv("OCR_MAX_LONG_EDGE", "2000"))
+# OCR.space free tier rejects files over 1 MB
+OCR_MAX_UPLOAD_BYTES = int(os.getenv("OCR_MAX_UPLOAD_BYTES", str(1024 * 1024)))
+JPEG_QUALITIES = (85, 75, 65, 50)
+SLIDE_IMAGE_LONG_EDGE = int(os.getenv("SLIDE_IMAGE_LONG_EDGE", "1024"))
+
+
+class UploadStats:
+    """Running totals of bytes before and after preprocessing."""
+
+    def __init__(self):
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def record(self, bytes_in, bytes_out):
+        with self._lock:
+            self.images += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    @property
+    def bytes_saved(self):
+        return self.bytes_in - self.bytes_out
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "images": self.images,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out,
+            }
+
+
+upload_stats = UploadStats()
+
+
+def normalize_image(image, max_long_edge):
+    """Applies EXIF rotation, converts to grayscale and caps the long edge."""
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("L")
+    if max(image.size) > max_long_edge:
+        image.thumbnail((max_long_edge, max_long_edge), Image.LANCZOS)
+    return image
+
+
+def encode_under_budget(image, max_bytes):
+    """
+    Encodes as PNG when that fits the budget (best for clean page renders),
+    otherwise as JPEG with decreasing quality, shrinking the image if needed.
+    Returns (data, extension).
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    if buffer.tell() <= max_bytes:
+        return buffer.getvalue(), "png"
+
+    while True:
+        for quality in JPEG_QUALITIES:
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= max_bytes:
+                return buffer.getvalue(), "jpg"
+        if max(image.size) < 500:
+            return buffer.getvalue(), "jpg"
+        image = image.resize((int(image.width * 0.75), int(image.height * 0.75)), Image.LANCZOS)
+
+
+def prepare_for_ocr(data, max_long_edge=None, max_bytes=None):
+    """
+    Shrinks an image before uploading it for OCR and records the bytes saved.
+    Returns (data, extension); the original bytes are returned unchanged if
+    they are already smaller than the processed version.
+    """
+    max_long_edge = max_long_edge or OCR_MAX_LONG_EDGE
+    max_bytes = max_bytes or OCR_MAX_UPLOAD_BYTES
+
+    with Image.open(io.BytesIO(data)) as image:
+        original_format = (image.format or "png").lower()
+        processed, ext = encode_under_budget(normalize_image(image, max_long_edge), max_bytes)
+
+    if len(processed) >= len(data) and len(data) <= max_bytes:
+        processed, ext = data, "jpg" if original_format == "jpeg" else original_format
+
+    upload_stats.record(len(data), len(processed))
+    print(f"🗜️ OCR upload {len(data) // 1024} KB -> {len(processed) // 1024} KB")
+    return processed, ext
+
+
+def encode_for_slide(data, max_long_edge=None, quality=85):
+    """Downscales a generated image and re-encodes it as JPEG for embedding in a deck."""
+    max_long_edge = max_long_edge or SLIDE_IMAGE_LONG_EDGE
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        if max(image.size) > max_long_edge:
+            image.thumbnail((max_long_edge, max_long_edge), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,81 @@
+# image_store.py
+import io
+import os
+
+from PIL import Image
+
+from cache_store import DiskCache, LRUCache, content_hash
+
+THUMBNAIL_SIZE = int(os.getenv("CHAT_THUMBNAIL_SIZE", "512"))
+# عدد الصور الكاملة المحفوظة في الذاكرة حتى لا نقرأها من القرص مع كل rerun
+HOT_IMAGES = int(os.getenv("CHAT_HOT_IMAGES", "32"))
+
+
+class ImageStore:
+    """
+    Keeps each image once, PNG encoded, next to a precomputed JPEG thumbnail.
+    Chat history stores only the returned id, so reruns render the small
+    thumbnail instead of decoding and re-encoding the full image.
+    """
+
+    def __init__(self, cache_dir, max_bytes=None, thumbnail_size=THUMBNAIL_SIZE, hot_images=HOT_IMAGES):
+        self.disk = DiskCache(cache_dir, suffix=".png", max_bytes=max_bytes)
+        self.thumbnails = DiskCache(os.path.join(cache_dir, "thumbnails"), suffix=".jpg", max_bytes=max_bytes)
+        self.thumbnail_size = thumbnail_size
+        self._hot_images = LRUCache(max_entries=hot_images)
+        self._hot_thumbnails = LRUCache(max_entries=128)
+
+    def put(self, data):
+        """Stores image bytes and returns their id (content hash)."""
+        image_id = content_hash(data)
+        if image_id in self._hot_images or self.disk.get(image_id) is not None:
+            return image_id
+
+        with Image.open(io.BytesIO(data)) as image:
+            if image.format != "PNG":
+                buffer = io.BytesIO()
+                image.save(buffer, format="PNG")
+                data = buffer.getvalue()
+
+            thumb = image.convert("RGB")
+            thumb.thumbnail((self.thumbnail_size, self.thumbnail_size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumb.save(buffer, format="JPEG", quality=80)
+
+        self.disk.put(image_id, data)
+        self._hot_images.put(image_id, data)
+        self.thumbnails.put(image_id, buffer.getvalue())
+        self._hot_thumbnails.put(image_id, buffer.getvalue())
+        return image_id
+
+    def get(self, image_id):
+        """Full PNG bytes, or None if the image was evicted."""
+        data = self._hot_images.get(image_id)
+        if data is None:
+            data = self.disk.get(image_id)
+            if data is not None:
+                self._hot_images.put(image_id, data)
+        return data
+
+    def thumbnail(self, image_id):
+        thumb = self._hot_thumbnails.get(image_id)
+        if thumb is None:
+            thumb = self.thumbnails.get(image_id)
+            if thumb is not None:
+                self._hot_thumbnails.put(image_id, thumb)
+        return thumb
+
+
+image_store = ImageStore(
+    os.getenv("CHAT_IMAGE_DIR", os.path.join(".cache", "chat_images")),
+    max_bytes=int(os.getenv("CHAT_IMAGE_MAX_BYTES", str(500 * 1024 * 1024))),
+)
+
+
+def image_ref(image_id):
+    """The small value kept in chat_history in place of the image bytes."""
+    return {"image": image_id}
+
+
+def is_image_ref(msg):
+    return isinstance(msg, dict) and "image" in msg
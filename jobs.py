@@ -0,0 +1,89 @@
+# jobs.py
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job:
+    """
+    One background task. `progress` is a dict the task may update while it
+    runs (it receives the job as its first argument) so the UI can poll it.
+    """
+
+    def __init__(self, kind, meta=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.meta = meta or {}
+        self.status = PENDING
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    @property
+    def is_finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class JobManager:
+    """
+    Runs slow work (OCR, slide generation, image calls) on a shared worker
+    pool so it survives Streamlit reruns. Sessions keep only job ids and poll
+    for results; finished jobs are dropped after `keep_seconds`.
+    """
+
+    def __init__(self, max_workers=8, keep_seconds=3600):
+        self.keep_seconds = keep_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, meta=None, **kwargs):
+        """Queues fn(job, *args, **kwargs) and returns the job id."""
+        job = Job(kind, meta)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except Exception as e:
+            print(f"❌ Job {job.kind} failed: {e}\n{traceback.format_exc()}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished is not None and now - job.finished > self.keep_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+job_manager = JobManager(max_workers=int(os.getenv("JOB_WORKERS", "8")))
@@ -0,0 +1,117 @@
+# json_stream.py
+import json
+import re
+
+
+def repair_json(fragment):
+    """
+    Closes a truncated JSON document: drops a string that was cut off (so no
+    half-word ends up in the result), a dangling comma or key, and appends
+    the missing closing brackets.
+    """
+    stack = []
+    in_string = False
+    escape = False
+    string_start = None
+    for i, ch in enumerate(fragment):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+            string_start = i
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    repaired = fragment
+    if in_string:
+        repaired = repaired[:string_start]
+    repaired = repaired.rstrip()
+
+    # قيمة ناقصة: "key": أو فاصلة في النهاية
+    repaired = re.sub(r',?\s*"(?:[^"\\]|\\.)*"\s*:\s*$', "", repaired)
+    repaired = re.sub(r",\s*$", "", repaired)
+    if stack and stack[-1] == "}":
+        # مفتاح بدون قيمة داخل object
+        repaired = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"$', lambda m: "{" if m.group(1) == "{" else "", repaired)
+    return repaired + "".join(reversed(stack))
+
+
+class ArrayItemParser:
+    """
+    Incrementally extracts complete objects from the JSON array stored under
+    `key` (or from a top-level array) while the document is still streaming.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.buffer = ""
+        self._pos = None        # next character to scan, once inside the array
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+        self.finished = False
+
+    def _find_array_start(self):
+        match = re.search(r'"%s"\s*:\s*\[' % re.escape(self.key), self.buffer)
+        if match:
+            return match.end()
+        stripped = self.buffer.lstrip("` \n\r\tjson")
+        if stripped.startswith("["):
+            return self.buffer.index("[") + 1
+        return None
+
+    def feed(self, text):
+        """Adds streamed text and returns the list of items completed by it."""
+        self.buffer += text
+        if self._pos is None:
+            self._pos = self._find_array_start()
+            if self._pos is None:
+                return []
+
+        items = []
+        while self._pos < len(self.buffer) and not self.finished:
+            ch = self.buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    self.finished = True  # نهاية الـ array
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        try:
+                            items.append(json.loads(self.buffer[self._item_start:self._pos + 1]))
+                        except ValueError:
+                            pass
+                        self._item_start = None
+            self._pos += 1
+        return items
+
+    def partial_item(self):
+        """The unfinished last item, repaired, or None."""
+        if self._item_start is None or self.finished:
+            return None
+        try:
+            return json.loads(repair_json(self.buffer[self._item_start:]))
+        except ValueError:
+            return None
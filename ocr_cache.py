@@ -0,0 +1,72 @@
+# ocr_cache.py
+import os
+import sqlite3
+import threading
+import time
+
+from cache_store import content_hash
+
+
+class OcrCache:
+    """
+    Persistent OCR results keyed on the image bytes hash plus language.
+    Stored in SQLite so every user of the server shares it. When the stored
+    text exceeds max_bytes the least recently used rows are evicted.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ocr_results (
+                   key TEXT PRIMARY KEY,
+                   language TEXT NOT NULL,
+                   text TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   last_used REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_last_used ON ocr_results(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(data, language):
+        return content_hash(data, language=language)
+
+    def get(self, data, language):
+        key = self.key(data, language)
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE ocr_results SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return row[0]
+
+    def put(self, data, language, text):
+        key = self.key(data, language)
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, language, text, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, language, text, size, time.time()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM ocr_results ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM ocr_results WHERE key = ?", (key,))
+            total -= size
@@ -1,14 +1,65 @@
 # ocr_handler.py
-import requests
 import os
-import time
+import io
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
+import http_client
+from rate_limit import TokenBucket
+from ocr_cache import OcrCache
+from image_prep import prepare_for_ocr
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # Tesseract backend is optional
+    pytesseract = None
 
 # Load environment variables
 load_dotenv(dotenv_path=".env")
 api_key = os.getenv("API_KEY_OCR") or "helloworld"
-def ocr_space_file(filename, language='eng', max_retries=3, delay=3):
-    """OCR.space API call with retries and fallback"""
+
+# remote | local | remote-first | local-first
+OCR_MODE = os.getenv("OCR_MODE", "remote-first")
+
+# حد عدد الطلبات لكل ثانية إلى OCR.space (مشترك بين كل الـ threads)
+ocr_rate_limiter = TokenBucket(
+    rate=float(os.getenv("OCR_REQUESTS_PER_SECOND", "2")),
+    capacity=int(os.getenv("OCR_BURST", "2")),
+)
+
+# كاش دائم لنتائج الـ OCR مشترك بين كل المستخدمين
+ocr_cache = OcrCache(
+    os.getenv("OCR_CACHE_PATH", os.path.join(".cache", "ocr_cache.sqlite3")),
+    max_bytes=int(os.getenv("OCR_CACHE_MAX_BYTES", str(50 * 1024 * 1024))),
+)
+
+# OCR.space language codes -> Tesseract language codes
+TESSERACT_LANGUAGES = {
+    'eng': 'eng',
+    'ara': 'ara',
+    'fre': 'fra',
+    'ger': 'deu',
+    'spa': 'spa',
+    'ita': 'ita',
+}
+
+
+class OCRError(Exception):
+    """Raised when no OCR engine could read the image."""
+
+
+def _ocr_space_should_retry(response):
+    # OCR.space يرجع أخطاء الضغط والـ timeout داخل رد 200، وأخطاء الحصة كنص عادي
+    try:
+        return bool(response.json().get("IsErroredOnProcessing"))
+    except ValueError:
+        return True
+
+
+def ocr_space_bytes(data, filename='image.png', language='eng', max_retries=3, delay=3):
+    """OCR.space API call on an in-memory image, with retries. Raises OCRError on failure."""
 
     payload = {
         'isOverlayRequired': False,
@@ -16,31 +67,133 @@ def ocr_space_file(filename, language='eng', max_retries=3, delay=3):
         'language': language,
     }
 
-    for attempt in range(1, max_retries + 1):
+    try:
+        print("📤 Sending to OCR.space...")
+        r = http_client.post(
+            "ocr.space",
+            'https://api.ocr.space/parse/image',
+            files={'filename': (filename, data)},
+            data=payload,
+            timeout=(5, 30),  # Increased read timeout for larger files
+            max_retries=max_retries,
+            backoff=delay,
+            rate_limiter=ocr_rate_limiter,
+            retry_if=_ocr_space_should_retry,
+        )
+        result = r.json()
+    except Exception as e:
+        raise OCRError(f"OCR.space request failed: {e}")
+
+    if result.get("IsErroredOnProcessing"):
+        raise OCRError(result.get("ErrorMessage", ["Unknown Error"])[0])
+
+    print("✅ OCR success")
+    return result["ParsedResults"][0]["ParsedText"]
+
+
+def _tesseract_worker(data, language):
+    # يعمل داخل process منفصل
+    image = Image.open(io.BytesIO(data))
+    return pytesseract.image_to_string(image, lang=language)
+
+
+class OcrSpaceEngine:
+    name = "ocr.space"
+
+    def available(self):
+        return True
+
+    def recognize(self, data, filename='image.png', language='eng'):
         try:
-            with open(filename, 'rb') as f:
-                print(f"📤 Attempt {attempt} sending to OCR.space...")
-                r = requests.post(
-                    'https://api.ocr.space/parse/image',
-                    files={'filename': f},
-                    data=payload,
-                    timeout=30  # Increased timeout for larger files
-                )
+            data, ext = prepare_for_ocr(data)
+            filename = os.path.splitext(filename)[0] + "." + ext
+        except Exception as e:
+            print(f"⚠️ Image preprocessing skipped: {e}")
+        return ocr_space_bytes(data, filename, language)
+
+
+class TesseractEngine:
+    """Local Tesseract OCR running in a process pool across all cores."""
+
+    name = "tesseract"
 
-            result = r.json()
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count()
+        self._pool = None
 
-            if result.get("IsErroredOnProcessing"):
-                raise Exception(result.get("ErrorMessage", ["Unknown Error"])[0])
+    def available(self):
+        return pytesseract is not None and shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
 
-            print("✅ OCR success")
-            return result["ParsedResults"][0]["ParsedText"]
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: لا ننسخ threads السيرفر ولا اتصال SQLite المفتوح إلى العمليات
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
 
+    def recognize(self, data, filename='image.png', language='eng'):
+        if not self.available():
+            raise OCRError("Tesseract is not installed")
+        lang = TESSERACT_LANGUAGES.get(language, language)
+        try:
+            return self._get_pool().submit(_tesseract_worker, data, lang).result()
         except Exception as e:
-            print(f"⚠️ Attempt {attempt} failed: {e}")
-            if attempt < max_retries:
-                print(f"⏳ Retrying in {delay} seconds...")
-                time.sleep(delay)
-            else:
-                print("❌ All OCR attempts failed. Using fallback.")
-
-    return "Dummy text from fallback (helloworld)"
+            raise OCRError(f"Tesseract failed: {e}")
+
+
+ocr_space_engine = OcrSpaceEngine()
+tesseract_engine = TesseractEngine(
+    max_workers=int(os.getenv("TESSERACT_WORKERS", "0")) or None
+)
+
+
+def get_engines(mode=None):
+    """Engines to try, in order, for the given OCR mode."""
+    mode = mode or OCR_MODE
+    if mode == "remote":
+        return [ocr_space_engine]
+    if mode == "local":
+        return [tesseract_engine]
+    if mode == "local-first":
+        return [tesseract_engine, ocr_space_engine]
+    if mode == "remote-first":
+        return [ocr_space_engine, tesseract_engine]
+    raise ValueError(f"Unknown OCR mode: {mode}")
+
+
+def ocr_bytes(data, filename='image.png', language='eng', mode=None):
+    """
+    OCRs an in-memory image. Checks ocr_cache first, then tries each engine
+    of the selected mode in turn, falling back to the next one on failure.
+    """
+    cached = ocr_cache.get(data, language)
+    if cached is not None:
+        print("✅ OCR cache hit")
+        return cached
+
+    mode = mode or OCR_MODE
+    errors = []
+    for engine in get_engines(mode):
+        if not engine.available():
+            continue
+        try:
+            text = engine.recognize(data, filename, language)
+        except OCRError as e:
+            print(f"⚠️ {engine.name} failed: {e}")
+            errors.append(f"{engine.name}: {e}")
+            continue
+        ocr_cache.put(data, language, text)
+        return text
+
+    if not errors:
+        raise OCRError(f"No OCR engine available for OCR_MODE={mode}")
+    raise OCRError(f"All OCR engines failed (OCR_MODE={mode}): " + "; ".join(errors))
+
+
+def ocr_space_file(filename, language='eng', mode=None):
+    """OCRs an image file with the configured engines (kept for existing callers)."""
+    with open(filename, 'rb') as f:
+        data = f.read()
+    return ocr_bytes(data, os.path.basename(filename), language, mode)
@@ -3,9 +3,35 @@ from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN
 from io import BytesIO
+import json
 import os
 import re
+import threading
 from typing import List, Dict, Optional, Union
+from cache_store import LRUCache, content_hash
+
+# القوالب تُقرأ من القرص مرة واحدة، والعروض الجاهزة تُحفظ في الكاش
+_template_cache = {}
+_template_lock = threading.Lock()
+render_cache = LRUCache(max_entries=int(os.getenv("PPTX_RENDER_CACHE_SIZE", "16")))
+
+def load_template(template_path: str):
+    """
+    Returns (template_bytes, template_hash), reading the file only when it is
+    new or has changed on disk. Each build opens its own copy from memory.
+    """
+    if not os.path.exists(template_path):
+        raise FileNotFoundError(f"Template file not found: {template_path}")
+    path = os.path.abspath(template_path)
+    mtime = os.path.getmtime(path)
+    with _template_lock:
+        cached = _template_cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+        with open(path, "rb") as f:
+            data = f.read()
+        _template_cache[path] = (mtime, data, content_hash(data))
+        return data, _template_cache[path][2]
 
 def is_arabic(text: str) -> bool:
     return any('\u0600' <= char <= '\u06FF' for char in text)
@@ -38,9 +64,25 @@ def create_presentation(
     bullet_font_size: int = 22,
     custom_fonts: Optional[Dict] = None,
     title_color: str = "#2A5CAA",
-    bullet_color: str = "#2A5CAA"
+    bullet_color: str = "#2A5CAA",
+    images: Optional[List[Optional[bytes]]] = None
 ) -> Union[BytesIO, bytes]:
-
+    """
+    Builds the deck and returns it as bytes (or a BytesIO). Rendered decks
+    are cached on a hash of the slides, template and style options, so
+    repeat calls with the same input skip XML parsing and zip writing.
+    images[i], when given, is placed on slide i.
+    """
+    options = {
+        "language": language,
+        "theme_color": theme_color,
+        "max_bullets": max_bullets,
+        "title_font_size": title_font_size,
+        "bullet_font_size": bullet_font_size,
+        "custom_fonts": custom_fonts,
+        "title_color": title_color,
+        "bullet_color": bullet_color,
+    }
     if not slides:
         raise ValueError("Slides list cannot be empty")
 
@@ -50,15 +92,44 @@ def create_presentation(
         if "title" not in slide or "bullets" not in slide:
             raise ValueError(f"Slide {i} missing 'title' or 'bullets'")
 
+    try:
+        template_bytes, template_hash = load_template(template_path)
+    except OSError as e:
+        raise RuntimeError(f"Presentation creation failed: {str(e)}")
+    key = content_hash(
+        json.dumps(slides, sort_keys=True, ensure_ascii=False).encode("utf-8"),
+        template=template_hash,
+        options=options,
+        images=[content_hash(image) if image else None for image in images or []],
+    )
+    pptx_bytes = render_cache.get(key)
+    if pptx_bytes is None:
+        pptx_bytes = _build_presentation(slides, template_bytes, images=images, **options)
+        render_cache.put(key, pptx_bytes)
+
+    if output_format == "bytes":
+        return pptx_bytes
+    return BytesIO(pptx_bytes)
+
+def _build_presentation(
+    slides: List[Dict],
+    template_bytes: bytes,
+    language: str,
+    theme_color: str,
+    max_bullets: int,
+    title_font_size: int,
+    bullet_font_size: int,
+    custom_fonts: Optional[Dict],
+    title_color: str,
+    bullet_color: str,
+    images: Optional[List[Optional[bytes]]] = None
+) -> bytes:
     fonts = {"arabic": "Arial", "english": "Calibri"}
     if custom_fonts:
         fonts.update(custom_fonts)
 
     try:
-        if not os.path.exists(template_path):
-            raise FileNotFoundError(f"Template file not found: {template_path}")
-
-        prs = Presentation(template_path)
+        prs = Presentation(BytesIO(template_bytes))
 
         title_rgb = RGBColor.from_string(title_color.lstrip("#"))
         bullet_rgb = RGBColor.from_string(bullet_color.lstrip("#"))
@@ -69,6 +140,8 @@ def create_presentation(
         TITLE_WIDTH = Inches(8)
         CONTENT_WIDTH = Inches(7.5)
         LEFT_MARGIN = Inches(1.8) if is_rtl else Inches(1)
+        IMAGE_SIZE = Inches(3.5)
+        IMAGE_LEFT = prs.slide_width - IMAGE_SIZE - Inches(0.4)
 
         blank_layout = next(
             (layout for layout in prs.slide_layouts if "blank" in layout.name.lower()),
@@ -94,11 +167,18 @@ def create_presentation(
                 title_rgb
             )
 
+            # Image (on the right, bullets get the remaining width)
+            image = images[i] if images and i < len(images) else None
+            content_width = CONTENT_WIDTH
+            if image:
+                slide.shapes.add_picture(BytesIO(image), IMAGE_LEFT, Inches(1.6), width=IMAGE_SIZE)
+                content_width = max(Inches(3), IMAGE_LEFT - LEFT_MARGIN - Inches(0.2))
+
             # Bullets
             bullets = slide_data.get("bullets", [])[:max_bullets]
             if bullets:
                 content_shape = slide.shapes.add_textbox(
-                    LEFT_MARGIN, Inches(1.6), CONTENT_WIDTH, Inches(4)
+                    LEFT_MARGIN, Inches(1.6), content_width, Inches(4)
                 )
                 content_frame = content_shape.text_frame
                 content_frame.word_wrap = True
@@ -135,13 +215,7 @@ def create_presentation(
 
         output = BytesIO()
         prs.save(output)
-
-        if output_format == "bytes":
-            return output.getvalue()
-        return output
+        return output.getvalue()
 
     except Exception as e:
         raise RuntimeError(f"Presentation creation failed: {str(e)}")
-    finally:
-        if 'output' in locals():
-            output.close()
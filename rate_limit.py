@@ -0,0 +1,43 @@
+# rate_limit.py
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens are added per second up to `capacity`.
+    acquire() blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, tokens=1):
+        """Seconds until `tokens` could be taken (0 if available now)."""
+        with self._lock:
+            self._refill()
+            missing = min(tokens, self.capacity) - self._tokens
+            return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+    def try_acquire(self, tokens=1):
+        # طلب أكبر من السعة يُعامل كأنه يملأ الـ bucket بالكامل
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        while not self.try_acquire(tokens):
+            time.sleep(max(self.wait_time(tokens), 0.01))
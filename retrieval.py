@@ -0,0 +1,103 @@
+# retrieval.py
+import os
+import re
+
+import numpy as np
+
+from cache_store import LRUCache, content_hash
+
+CHUNK_WORDS = int(os.getenv("RETRIEVAL_CHUNK_WORDS", "200"))
+CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "40"))
+TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def chunk_text(text, chunk_words=None, overlap=None):
+    """Splits text into overlapping windows of words."""
+    chunk_words = chunk_words or CHUNK_WORDS
+    overlap = CHUNK_OVERLAP if overlap is None else overlap
+    words = text.split()
+    if not words:
+        return []
+    step = max(chunk_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class BM25Index:
+    """Okapi BM25 over the chunks of one document, built once in memory."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.doc_lengths = np.zeros(len(chunks), dtype=np.float32)
+        postings = {}
+        for doc_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            self.doc_lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        self.avg_length = float(self.doc_lengths.mean()) if len(chunks) else 0.0
+        n = len(chunks)
+        self.postings = {}
+        for token, entries in postings.items():
+            doc_ids = np.array([d for d, _ in entries], dtype=np.int32)
+            tfs = np.array([tf for _, tf in entries], dtype=np.float32)
+            idf = np.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            self.postings[token] = (doc_ids, tfs, idf)
+
+    def scores(self, query):
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        if not self.chunks:
+            return scores
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_length, 1.0))
+        for token in set(tokenize(query)):
+            entry = self.postings.get(token)
+            if entry is None:
+                continue
+            doc_ids, tfs, idf = entry
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + norm[doc_ids])
+        return scores
+
+    def search(self, query, k=None):
+        """Returns the top-k chunks in document order, best matches first if none match."""
+        k = k or TOP_K
+        if len(self.chunks) <= k:
+            return list(self.chunks)
+        scores = self.scores(query)
+        top = np.argsort(-scores, kind="stable")[:k]
+        if scores[top[0]] <= 0:
+            top = np.arange(k)  # لا يوجد تطابق: نرجع بداية المستند
+        return [self.chunks[i] for i in sorted(top)]
+
+
+# فهرس واحد لكل مستند بدل إعادة البناء مع كل سؤال
+_indexes = LRUCache(max_entries=16)
+
+
+def get_index(text):
+    key = content_hash(text.encode("utf-8"), chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP)
+    index = _indexes.get(key)
+    if index is None:
+        index = BM25Index(chunk_text(text))
+        _indexes.put(key, index)
+    return index
+
+
+def build_context(text, question, k=None):
+    """The parts of text most relevant to question, joined for a prompt."""
+    return "\n\n...\n\n".join(get_index(text).search(question, k))
@@ -0,0 +1,57 @@
+# scheduler.py
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+from rate_limit import TokenBucket
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+class RequestScheduler:
+    """
+    Process-wide gate in front of a rate-limited API. Callers wait in a
+    priority queue (lower number first, FIFO within a priority) and the head
+    of the queue is released once both the requests/min and tokens/min
+    buckets allow it.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute / 60.0, capacity=max(1, requests_per_minute // 4))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, capacity=max(1, tokens_per_minute // 4))
+        self._queue = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._served = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    @contextmanager
+    def slot(self, priority=BULK, tokens=1):
+        """Blocks until this request may be sent, then runs the body."""
+        ticket = (priority, next(self._counter))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            while True:
+                if self._queue[0] == ticket:
+                    wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if wait == 0 and self.requests.try_acquire(1):
+                        self.tokens.try_acquire(tokens)
+                        heapq.heappop(self._queue)
+                        self._served[PRIORITY_NAMES.get(priority, str(priority))] += 1
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(timeout=max(wait, 0.05))
+                else:
+                    self._cond.wait(timeout=1)
+        yield
+
+    def metrics(self):
+        """Queue depth per priority and requests served so far."""
+        with self._cond:
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._queue:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                waiting[name] = waiting.get(name, 0) + 1
+            return {"waiting": waiting, "served": dict(self._served)}
@@ -0,0 +1,166 @@
+# session_snapshot.py
+"""
+Binary session snapshot format (version 1):
+
+    MAGIC (6 bytes) | version (uint16) | manifest length (uint32) | manifest | blobs
+
+The manifest is zlib-compressed JSON with the small session fields (chat
+roles and texts, slides, template) plus {hash: [offset, length]} for every
+blob. Blobs are zlib-compressed and stored once per SHA-256 of their content:
+the document text, long chat messages and each chat image. Loading reads
+only the manifest; a blob is decompressed only when it is asked for.
+"""
+import hashlib
+import json
+import struct
+import zlib
+
+MAGIC = b"GCSNAP"
+VERSION = 1
+HEADER = struct.Struct(">6sHI")
+# رسائل الشات الأطول من هذا تُخزن كـ blob
+INLINE_TEXT_LIMIT = 2048
+
+
+class SnapshotError(ValueError):
+    """Raised when the uploaded data is not a readable snapshot."""
+
+
+def is_snapshot(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+class SnapshotWriter:
+    """
+    Builds snapshots for one session. Compressed blobs are kept between
+    saves, so a repeated save only compresses what changed, and an
+    unchanged session returns the previous snapshot as is.
+    """
+
+    def __init__(self):
+        self._compressed = {}
+        self._last_manifest_hash = None
+        self._last_snapshot = None
+
+    def _add_blob(self, blobs, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if digest not in self._compressed:
+            self._compressed[digest] = zlib.compress(data, 6)
+        blobs[digest] = self._compressed[digest]
+        return digest
+
+    def build(self, chat_history, file_text, slides, template_selected, load_image):
+        """
+        chat_history entries are (role, text) or (role, {"image": id});
+        load_image(id) returns the image bytes or None if it is gone.
+        """
+        blobs = {}
+        history = []
+        for role, msg in chat_history:
+            if isinstance(msg, dict) and "image" in msg:
+                image = load_image(msg["image"])
+                if image is not None:
+                    history.append([role, {"image": self._add_blob(blobs, image)}])
+            elif isinstance(msg, str) and len(msg) > INLINE_TEXT_LIMIT:
+                history.append([role, {"text_blob": self._add_blob(blobs, msg.encode("utf-8"))}])
+            elif isinstance(msg, str):
+                history.append([role, msg])
+
+        manifest = {
+            "chat_history": history,
+            "file_text": self._add_blob(blobs, file_text.encode("utf-8")) if file_text else None,
+            "slides_to_generate": slides,
+            "template_selected": template_selected,
+        }
+
+        # نحذف الـ blobs التي لم تعد مستخدمة
+        self._compressed = {digest: self._compressed[digest] for digest in blobs}
+
+        manifest_hash = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode("utf-8")).hexdigest()
+        if manifest_hash == self._last_manifest_hash:
+            return self._last_snapshot
+
+        offsets = {}
+        position = 0
+        for digest, data in blobs.items():
+            offsets[digest] = [position, len(data)]
+            position += len(data)
+        manifest["blobs"] = offsets
+        manifest_bytes = zlib.compress(json.dumps(manifest, ensure_ascii=False).encode("utf-8"), 9)
+
+        snapshot = b"".join([HEADER.pack(MAGIC, VERSION, len(manifest_bytes)), manifest_bytes, *blobs.values()])
+        self._last_manifest_hash = manifest_hash
+        self._last_snapshot = snapshot
+        return snapshot
+
+
+class Snapshot:
+    """A loaded snapshot; only the manifest is decoded up front."""
+
+    def __init__(self, data):
+        if len(data) < HEADER.size:
+            raise SnapshotError("Snapshot is truncated")
+        magic, version, manifest_length = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise SnapshotError("Not a session snapshot")
+        if version > VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+        start = HEADER.size
+        if start + manifest_length > len(data):
+            raise SnapshotError("Snapshot is truncated")
+        try:
+            self.manifest = json.loads(zlib.decompress(data[start:start + manifest_length]))
+            blobs = self.manifest["blobs"]
+            history = self.manifest["chat_history"]
+        except (zlib.error, ValueError, KeyError, TypeError) as e:
+            raise SnapshotError(f"Corrupted snapshot manifest: {e}")
+        if not isinstance(blobs, dict) or not isinstance(history, list):
+            raise SnapshotError("Corrupted snapshot manifest")
+        self._data = data
+        self._blob_start = start + manifest_length
+
+        # كل blob يجب أن يكون داخل الملف، حتى لا نكتشف ملفًا مقطوعًا لاحقًا
+        blob_bytes = len(data) - self._blob_start
+        for digest, span in blobs.items():
+            if (not isinstance(span, list) or len(span) != 2
+                    or not all(isinstance(n, int) and n >= 0 for n in span)
+                    or span[0] + span[1] > blob_bytes):
+                raise SnapshotError(f"Snapshot is truncated or corrupted (blob {digest[:12]})")
+
+    def blob(self, digest):
+        """
+        Decompresses one blob and checks it against its SHA-256; the caller
+        keeps the result. Raises SnapshotError if it is missing or damaged.
+        """
+        try:
+            offset, length = self.manifest["blobs"][digest]
+            start = self._blob_start + offset
+            data = zlib.decompress(self._data[start:start + length])
+        except (KeyError, TypeError, zlib.error) as e:
+            raise SnapshotError(f"Cannot read blob {str(digest)[:12]}: {e}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f"Blob {digest[:12]} does not match its hash")
+        return data
+
+    def chat_history(self):
+        """
+        History as stored, nothing decoded: long texts stay {"text_blob": hash}
+        and images {"image": hash} until passed to message() / blob().
+        """
+        return [(role, msg) for role, msg in self.manifest["chat_history"]]
+
+    def message(self, msg):
+        """Decodes a long-text ref from chat_history(); other messages are returned as is."""
+        if isinstance(msg, dict) and "text_blob" in msg:
+            return self._text(msg["text_blob"])
+        return msg
+
+    def file_text(self):
+        digest = self.manifest.get("file_text")
+        return self._text(digest) if digest else ""
+
+    def _text(self, digest):
+        try:
+            return self.blob(digest).decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise SnapshotError(f"Blob {digest[:12]} is not text: {e}")
@@ -0,0 +1,34 @@
+# text_split.py
+import re
+
+# نهاية الجملة (عربي / إنجليزي / صيني) أو سطر جديد
+SENTENCE_END = re.compile(r"(?<=[.!?؟؛。])\s+|\n+")
+
+
+def split_sentences(text, max_chars):
+    """
+    Splits text at sentence boundaries into chunks of at most max_chars.
+    Short sentences are packed together; a sentence longer than max_chars
+    is cut at its last space before the limit.
+    """
+    chunks, current = [], ""
+    for sentence in SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            # جملة طويلة جدًا: نقسمها عند آخر مسافة
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].strip()
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
@@ -1,12 +1,115 @@
 # translator.py
 
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from googletrans import Translator
+from cache_store import LRUCache
+from text_split import split_sentences
 
-translator = Translator()
+# حد الطلب الواحد في خدمة الترجمة (~5000 حرف) مع هامش
+MAX_REQUEST_CHARS = int(os.getenv("TRANSLATE_MAX_CHARS", "4500"))
+TRANSLATE_MAX_WORKERS = int(os.getenv("TRANSLATE_MAX_WORKERS", "4"))
+
+
+class GoogleTransBackend:
+    """Default backend: one googletrans Translator per thread."""
+
+    name = "googletrans"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def translate(self, text, dest):
+        if not hasattr(self._local, "translator"):
+            self._local.translator = Translator()
+        return self._local.translator.translate(text, dest=dest).text
+
+
+_backend = GoogleTransBackend()
+_cache = LRUCache(max_entries=int(os.getenv("TRANSLATE_CACHE_SIZE", "4096")))
+
+def set_backend(backend):
+    """Swaps the translation backend (any object with name and translate(text, dest) -> str)."""
+    global _backend
+    _backend = backend
+
+def make_batches(pieces, max_chars):
+    """Groups single-line pieces so each newline-joined batch stays under max_chars."""
+    batches, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) + 1 > max_chars:
+            batches.append(current)
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        batches.append(current)
+    return batches
+
+def translate_batch(batch, dest, backend):
+    """Translates many pieces in one request; falls back to one request per piece if lines get merged."""
+    translated = backend.translate("\n".join(batch), dest).split("\n")
+    if len(translated) != len(batch):
+        translated = [backend.translate(piece, dest) for piece in batch]
+    return [t.strip() for t in translated]
+
+def translate_many(texts, dest="ar", backend=None, max_workers=None):
+    """
+    Translates a list of strings with as few requests as possible. Lines are
+    kept, long lines are split at sentence boundaries, pieces are batched
+    under the service limit and batches run concurrently. Results are cached
+    by (text, dest).
+    """
+    backend = backend or _backend
+    max_chars = MAX_REQUEST_CHARS
+
+    # كل نص -> أسطر -> أجزاء
+    layout = []
+    results = {}
+    todo = []
+    for text in texts:
+        lines = []
+        for line in text.split("\n"):
+            pieces = split_sentences(line, max_chars)
+            lines.append(pieces)
+            for piece in pieces:
+                if piece in results:
+                    continue
+                cached = _cache.get((backend.name, piece, dest))
+                results[piece] = cached
+                if cached is None:
+                    todo.append(piece)
+        layout.append(lines)
+
+    if todo:
+        batches = make_batches(todo, max_chars)
+        with ThreadPoolExecutor(max_workers=max_workers or TRANSLATE_MAX_WORKERS) as pool:
+            translated_batches = pool.map(lambda batch: translate_batch(batch, dest, backend), batches)
+            for batch, translated in zip(batches, translated_batches):
+                for piece, result in zip(batch, translated):
+                    results[piece] = result
+                    _cache.put((backend.name, piece, dest), result)
+
+    return [
+        "\n".join(" ".join(results[piece] for piece in pieces) for pieces in lines)
+        for lines in layout
+    ]
+
+def translate_slides(slides, dest="ar", backend=None):
+    """Translates the titles and bullets of a slide list in one batched pass."""
+    texts = []
+    for slide in slides:
+        texts.append(slide["title"])
+        texts.extend(slide["bullets"])
+    translated = iter(translate_many(texts, dest, backend))
+    return [
+        {**slide, "title": next(translated), "bullets": [next(translated) for _ in slide["bullets"]]}
+        for slide in slides
+    ]
 
 def translate_text(text, dest="ar"):
     try:
-        translated = translator.translate(text, dest=dest)
-        return translated.text
+        return translate_many([text], dest)[0]
     except Exception as e:
         return f"Translation error: {str(e)}"
@@ -1,26 +1,63 @@
-from gtts import gTTS
 import os
-import tempfile
-import platform
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from gtts import gTTS
+from cache_store import LRUCache, content_hash
+import text_split
 
-def speak(text, lang="en"):
-    try:
-        tts = gTTS(text=text, lang=lang)
+TTS_MAX_CHUNK_CHARS = int(os.getenv("TTS_MAX_CHUNK_CHARS", "300"))
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+
+
+class GTTSBackend:
+    """Default backend: Google Translate TTS through gTTS, returns mp3 bytes."""
+
+    name = "gtts"
 
-        # Create and close a temp file before playing
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
-            temp_path = fp.name
+    def synthesize(self, text, lang):
+        buffer = BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
 
-        # Save the audio
-        tts.save(temp_path)
 
-        # Play the file depending on the OS
-        if platform.system() == "Windows":
-            os.system(f'start /min "" "{temp_path}"')
-        elif platform.system() == "Darwin":
-            os.system(f"afplay '{temp_path}'")
-        else:
-            os.system(f"xdg-open '{temp_path}'")
+_backend = GTTSBackend()
+_audio_cache = LRUCache(max_entries=int(os.getenv("TTS_CACHE_SIZE", "512")))
 
+def set_backend(backend):
+    """Swaps the synthesis backend (any object with name and synthesize(text, lang) -> bytes)."""
+    global _backend
+    _backend = backend
+
+def split_sentences(text, max_chars=None):
+    """Splits text at sentence boundaries into chunks of at most max_chars."""
+    return text_split.split_sentences(text, max_chars or TTS_MAX_CHUNK_CHARS)
+
+def synthesize_chunk(text, lang, backend=None):
+    backend = backend or _backend
+    key = content_hash(text.encode("utf-8"), lang=lang, backend=backend.name)
+    audio = _audio_cache.get(key)
+    if audio is None:
+        audio = backend.synthesize(text, lang)
+        _audio_cache.put(key, audio)
+    return audio
+
+def iter_speech(text, lang="en", backend=None, max_workers=None):
+    """
+    Synthesizes the sentence chunks of text concurrently and yields their
+    audio in order, so the first chunk can play before the rest finish.
+    """
+    chunks = split_sentences(text)
+    if not chunks:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers or TTS_MAX_WORKERS) as pool:
+        yield from pool.map(lambda chunk: synthesize_chunk(chunk, lang, backend), chunks)
+
+def speak(text, lang="en", backend=None):
+    """Returns the whole text as one in-memory mp3 (BytesIO) for st.audio, or None on error."""
+    try:
+        audio = BytesIO(b"".join(iter_speech(text, lang, backend)))
+        audio.seek(0)
+        return audio
     except Exception as e:
         print(f"TTS Error: {e}")
+        return None